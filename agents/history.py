@@ -0,0 +1,14 @@
+from typing import Any, List, NamedTuple, Tuple
+
+class Turn(NamedTuple):
+    """One user/assistant exchange in a conversation history."""
+    user: str
+    assistant: str
+    reasoning: Tuple[str, ...] = ()
+
+def as_turns(history: List[Any]) -> List[Any]:
+    """Convert legacy {"user": ..., "assistant": ...} entries of a history list to Turns in place and return the list."""
+    for index, entry in enumerate(history):
+        if isinstance(entry, dict):
+            history[index] = Turn(entry.get("user") or "", entry.get("assistant") or "", tuple(entry.get("reasoning") or ()))
+    return history
@@ -1,25 +1,99 @@
 import os
 import json
-from typing import List, Dict, Any, Optional, TypedDict, Annotated
+import functools
+from typing import List, Dict, Any, Iterator, Optional
 from dotenv import load_dotenv
 
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, ToolMessage
 from langchain_core.tools import tool
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, MessagesState, START, END
 from langgraph.prebuilt import ToolNode, tools_condition
 from langgraph.checkpoint.memory import MemorySaver
 
 from agents.tools import record_students_lead, record_workshops_lead, record_feedback
+from agents.history import Turn
+from utils.files import read_text
 
 load_dotenv()
 
-class AgentState(TypedDict):
-    messages: Annotated[List[Any], "The messages in the conversation"]
-    reasoning: str
-    next_action: str
-    is_final: bool
+THINKING_TAG = "THINKING:"
+RESPONSE_TAG = "RESPONSE:"
+
+# Asking for the reasoning inside the same completion avoids a separate reasoning round-trip
+REASONING_INSTRUCTIONS = (
+    "Before replying, think step by step about this request. What is the user asking for? What action should you take? "
+    f"Start every reply with \"{THINKING_TAG}\" followed by that reasoning, then write \"{RESPONSE_TAG}\" followed by your message to the user. "
+    f"When calling a tool, only the {THINKING_TAG} part is needed."
+)
+
+def _split_reasoning(content: str, has_tool_calls: bool = False) -> tuple[str, str]:
+    """
+    Split a model reply into its reasoning and its user-facing response.
+    
+    Tool calls only need the reasoning. A plain reply that skipped the RESPONSE tag
+    keeps its text as the response, so an answer is never reduced to an empty message.
+    """
+    content = content.strip()
+    if not content.startswith(THINKING_TAG):
+        return "", content
+    reasoning, _, response = content[len(THINKING_TAG):].partition(RESPONSE_TAG)
+    reasoning, response = reasoning.strip(), response.strip()
+    if has_tool_calls or response:
+        return reasoning, response
+    return "", reasoning or content
+
+# Cut off run-on completions that start writing the next turn
+STOP_SEQUENCES = ["\nUser:", "\nHuman:"]
+
+# Number of recent messages always sent verbatim; older turns are folded into a running summary
+HISTORY_WINDOW = 20
+
+# The summary is internal and never shown to the user, so a small fast model is enough;
+# replies and tool calls keep the configured model. Temperature 0 keeps summaries stable.
+SUMMARY_MODEL = "gpt-4o-mini"
+
+SUMMARY_INSTRUCTIONS = (
+    "Summarize the conversation below between a user and the EduZen assistant in a few sentences. "
+    "Keep names, contact details, requests and anything already recorded."
+)
+
+class AgentState(MessagesState):
+    reasoning: List[str]
+    summary: str
+    summarized_count: int
+
+def _agent_node(state: AgentState, config: RunnableConfig):
+    # Each agent's graph copy carries the agent in its bound config (see _build_graph)
+    agent = config["configurable"]["agent"]
+    return agent._agent_step(state)
+
+def _should_continue(state: AgentState):
+    """Determine if we should continue with tool calls or end."""
+    messages = state["messages"]
+    last_message = messages[-1]
+    if isinstance(last_message, AIMessage) and last_message.tool_calls:
+        return "tools"
+    return END
+
+# Tools available to every ReAct agent
+TOOLS = (record_students_lead, record_workshops_lead, record_feedback)
+
+# LangChain tools are not hashable, so the graph is compiled from the module-level TOOLS once
+@functools.lru_cache(maxsize=None)
+def _compile_graph():
+    workflow = StateGraph(AgentState)
+    
+    workflow.add_node("agent", _agent_node)
+    workflow.add_node("tools", ToolNode(list(TOOLS)))
+    
+    workflow.set_entry_point("agent")
+    
+    workflow.add_conditional_edges("agent", _should_continue)
+    workflow.add_edge("tools", "agent")
+    
+    return workflow.compile()
 
 class EduZenReActAgent:
     def __init__(self, personality, model="gpt-4", temperature=0.7, top_p=1.0, max_tokens=None):
@@ -37,6 +111,7 @@ class EduZenReActAgent:
             "model": model,
             "temperature": temperature,
             "top_p": top_p,
+            "stop": STOP_SEQUENCES,
             "api_key": os.getenv("OPENAI_API_KEY")
         }
         
@@ -45,131 +120,139 @@ class EduZenReActAgent:
             llm_params["max_tokens"] = max_tokens
             
         self.llm = ChatOpenAI(**llm_params)
+        self.llm_summary = ChatOpenAI(model=SUMMARY_MODEL, temperature=0, api_key=os.getenv("OPENAI_API_KEY"))
         
         self.personality = personality
         self.business_summary = self._load_business_summary()
         self.instructions = self._load_instructions()
         self.personality_style = self._load_personality(personality)
+        self._system_prompt = self._create_system_prompt()
+        self._system_messages = self._create_system_messages()
 
-        self.tools = [record_students_lead, record_workshops_lead, record_feedback]
+        self.tools = list(TOOLS)
         self.llm_with_tools = self.llm.bind_tools(self.tools)
         
         self.graph = self._build_graph()
     
     def _load_business_summary(self) -> str:
         try:
-            with open("../me/business_summary.txt", "r", encoding="utf-8") as f:
-                return f.read().strip()
+            return read_text("../me/business_summary.txt")
         except FileNotFoundError:
             return "EduZen Agency - Educational services provider"
     
     def _load_instructions(self) -> str:
         try:
-            with open("../prompts/instructions.txt", "r", encoding="utf-8") as f:
-                return f.read().strip()
+            return read_text("../prompts/instructions.txt")
         except FileNotFoundError:
             return "Provide helpful assistance with educational services."
     
     def _load_personality(self, personality: str) -> str:
         try:
-            with open(f"../prompts/personalities/{personality}.txt", "r", encoding="utf-8") as f:
-                return f.read().strip()
+            return read_text(f"../prompts/personalities/{personality}.txt")
         except FileNotFoundError:
            return "Be helpful and professional."
     
     def _create_system_prompt(self) -> str:
-        return f" {self.business_summary} \n {self.instructions} \n {self.personality_style}"
+        # The business summary is sent as its own leading system message (see _create_system_messages)
+        return f"{self.instructions}\n\n{self.personality_style}\n\n{REASONING_INSTRUCTIONS}"
 
-    def _build_graph(self) -> StateGraph:
-        
-        def reasoning_node(state: MessagesState):
-            messages = state["messages"]
-            reasoning_prompt = ChatPromptTemplate.from_messages([
-                ("system", self._create_system_prompt()),
-                ("human", "Think step by step about this request. What is the user asking for? What action should I take?\n\nUser message: {input}"),
-            ])
-            latest_message = messages[-1].content if messages else ""
-            reasoning_chain = reasoning_prompt | self.llm # Langchain pipe operator
-            reasoning_response = reasoning_chain.invoke({"input": latest_message})
-            response = AIMessage(content=f"THINKING: {reasoning_response.content}")
-            return {
-                "messages": messages + [response],
-            }
-        
-        def agent_node(state: MessagesState):
-            messages = state["messages"]
-            formatted_messages = [
-                SystemMessage(content=self._create_system_prompt())
-            ] + messages
-            response = self.llm_with_tools.invoke(formatted_messages)
-            return {"messages": messages + [response]}
-        
-        def should_continue(state: MessagesState):
-            """Determine if we should continue with tool calls or end."""
-            messages = state["messages"]
-            last_message = messages[-1]
-            if hasattr(last_message, 'tool_calls') and last_message.tool_calls:
-                return "tools"
-            return END
-        
-        workflow = StateGraph(MessagesState)
+    def _create_system_messages(self) -> List[SystemMessage]:
+        # Largest, most static block first so the prompt prefix stays byte-identical across turns and threads,
+        # which lets OpenAI's automatic prompt caching reuse it
+        return [
+            SystemMessage(content=self.business_summary),
+            SystemMessage(content=self._system_prompt)
+        ]
+
+    def _summarize(self, summary: str, messages: List[Any]) -> str:
+        lines = [f"Earlier summary: {summary}"] if summary else []
+        for msg in messages:
+            if isinstance(msg, HumanMessage):
+                lines.append(f"User: {msg.content}")
+            elif isinstance(msg, AIMessage) and msg.content:
+                lines.append(f"Assistant: {msg.content}")
+        response = self.llm_summary.invoke([SystemMessage(content=SUMMARY_INSTRUCTIONS), HumanMessage(content="\n".join(lines))])
+        return response.content.strip()
+
+    def _agent_step(self, state: AgentState) -> Dict[str, Any]:
+        messages = state["messages"]
+        summary = state.get("summary", "")
+        summarized_count = state.get("summarized_count", 0)
         
-        workflow.add_node("reasoning", reasoning_node)
-        workflow.add_node("agent", agent_node)
-        workflow.add_node("tools", ToolNode(self.tools))
+        # Once more than two windows are pending, fold everything before the last window into the summary.
+        # Refreshing in window-sized steps keeps the sent prefix unchanged between refreshes.
+        if len(messages) - summarized_count > 2 * HISTORY_WINDOW:
+            cut = next((i for i in range(len(messages) - HISTORY_WINDOW, len(messages))
+                        if isinstance(messages[i], HumanMessage)), None)
+            if cut is not None:
+                summary = self._summarize(summary, messages[summarized_count:cut])
+                summarized_count = cut
         
-        workflow.set_entry_point("reasoning")
+        system_messages = self._system_messages
+        if summary:
+            system_messages = system_messages + [SystemMessage(content=f"Summary of the earlier conversation: {summary}")]
         
-        workflow.add_edge("reasoning", "agent")
-        workflow.add_conditional_edges("agent", should_continue)
-        workflow.add_edge("tools", "agent")
+        formatted_messages = system_messages + messages[summarized_count:]
+        response = self.llm_with_tools.invoke(formatted_messages)
         
-        return workflow.compile(checkpointer=MemorySaver())
+        # Keep the reasoning in state and only the reply in the history the model sees on later calls
+        reasoning, response.content = _split_reasoning(response.content, bool(response.tool_calls))
+        reasoning_steps = state.get("reasoning", [])
+        if reasoning:
+            reasoning_steps = reasoning_steps + [reasoning]
+        return {
+            "messages": messages + [response],
+            "reasoning": reasoning_steps,
+            "summary": summary,
+            "summarized_count": summarized_count
+        }
+
+    def _build_graph(self) -> StateGraph:
+        # Reuse the compiled graph shared by all agents; only the checkpointer and the bound agent are
+        # per agent, and the bound config is merged into every call, so callers only pass a thread_id
+        graph = _compile_graph().copy(update={"checkpointer": MemorySaver()})
+        return graph.with_config(configurable={"agent": self})
+
+    def _thread_config(self, thread_id: str) -> Dict[str, Any]:
+        return {"configurable": {"thread_id": thread_id}}
     
-    def chat(self, message: str, thread_id: str = "default") -> tuple[str, List[str]]:
+    def chat(self, message: str, thread_id: str = "default") -> tuple[str, tuple[str, ...]]:
+        final_response, reasoning_steps = "", ()
+        for final_response, reasoning_steps in self.chat_stream(message, thread_id):
+            pass
+        return final_response, reasoning_steps
+    
+    def chat_stream(self, message: str, thread_id: str = "default") -> Iterator[tuple[str, tuple[str, ...]]]:
+        """Answer a message, yielding (response so far, reasoning steps so far) after every graph step."""
         try:
-            input_data = { "messages": [HumanMessage(content=message)]}
-            config = {"configurable": {"thread_id": thread_id}}
-            result = self.graph.invoke(input_data, config)
-            
-            # Collect all reasoning steps and final response
-            reasoning_steps = []
-            final_response = ""
+            # Reasoning is reset every turn so the result only holds this turn's steps
+            input_data = {"messages": [HumanMessage(content=message)], "reasoning": []}
+            config = self._thread_config(thread_id)
             
-            # Extract all AI messages from the result
-            for msg in result["messages"]:
-                if isinstance(msg, AIMessage):
-                    if msg.content.startswith("THINKING:"):
-                        # Extract reasoning step
-                        reasoning_steps.append(msg.content.replace("THINKING:", "").strip())
-                    else:
-                        # This is the final response
-                        final_response = msg.content
+            final_response, reasoning_steps = "", ()
+            for state in self.graph.stream(input_data, config, stream_mode="values"):
+                last_message = state["messages"][-1]
+                final_response = last_message.content if isinstance(last_message, AIMessage) else ""
+                reasoning_steps = tuple(state.get("reasoning", ()))
+                yield final_response, reasoning_steps
             
-            # Return final answer and reasoning steps as separate values
             if not final_response:
-                final_response = "I apologize, but I encountered an issue processing your request. Please try again."
-            
-            return final_response, reasoning_steps
+                yield "I apologize, but I encountered an issue processing your request. Please try again.", reasoning_steps
             
         except Exception as e:
             error_msg = f"I apologize, but I encountered an error: {str(e)}. Please try again or contact our support team."
-            return error_msg, []
+            yield error_msg, ()
     
-    def chat_with_history(self, message: str, history: List[Dict[str, str]] = None, thread_id: str = "default") -> tuple[tuple[str, List[str]], List[Dict[str, str]]]:
+    def chat_with_history(self, message: str, history: List[Turn] = None, thread_id: str = "default") -> tuple[tuple[str, tuple[str, ...]], List[Turn]]:
+        """Answer a message. The given history list is extended in place and returned."""
         if history is None: history = []
         final_answer, reasoning_steps = self.chat(message, thread_id)
-        updated_history = history.copy()
-        updated_history.append({
-            "user": message,
-            "assistant": final_answer,
-            "reasoning": reasoning_steps
-        })
-        return (final_answer, reasoning_steps), updated_history
+        history.append(Turn(message, final_answer, reasoning_steps))
+        return (final_answer, reasoning_steps), history
     
     def get_graph_state(self, thread_id: str = "default") -> Dict:
         try:
-            config = {"configurable": {"thread_id": thread_id}}
+            config = self._thread_config(thread_id)
             return self.graph.get_state(config)
         except Exception as e:
             return {"error": str(e)}
@@ -177,14 +260,14 @@ class EduZenReActAgent:
     def clear_history(self, thread_id: str = "default") -> bool:
         """Clear conversation history for a specific thread."""
         try:
-            config = {"configurable": {"thread_id": thread_id}}
+            config = self._thread_config(thread_id)
             current_state = self.graph.get_state(config)
             
             if current_state is None or not hasattr(current_state, 'values'):
                 # Thread doesn't exist or is already empty
                 return True
             
-            empty_state = {"messages": []}
+            empty_state = {"messages": [], "summary": "", "summarized_count": 0}
             self.graph.update_state(config, empty_state)
             return True
             
@@ -209,6 +292,7 @@ class EduZenReActAgent:
             "model": self.config["model"],
             "temperature": self.config["temperature"],
             "top_p": self.config["top_p"],
+            "stop": STOP_SEQUENCES,
             "api_key": os.getenv("OPENAI_API_KEY")
         }
         
@@ -218,7 +302,7 @@ class EduZenReActAgent:
         self.llm = ChatOpenAI(**llm_params)
         self.llm_with_tools = self.llm.bind_tools(self.tools)
         
-        # Rebuild the graph with updated LLM
+        # Nodes look up the LLM at run time; a fresh graph copy resets conversation memory as before
         self.graph = self._build_graph()
 
 def create_agent(personality, **config):
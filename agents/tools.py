@@ -1,8 +1,58 @@
 import json
-from typing import Dict, Any, List
+import os
+import re
+import threading
+import orjson
+from datetime import datetime
+from typing import Callable, Dict, Any, List
 from langchain_core.tools import tool
 from utils.xlsx import save_student_lead, save_workshop_lead, save_feedback
 
+# Every record is appended here before its workbook save is queued. Nothing reads it back: it is a
+# trail for recovering rows by hand if the process is killed before the background writer saves them.
+# It holds personal data, so once it reaches JOURNAL_MAX_BYTES it is rotated to a single ".1" copy.
+JOURNAL_FILE = "leads_journal.jsonl"
+JOURNAL_MAX_BYTES = 5 * 1024 * 1024
+_JOURNAL_LOCK = threading.Lock()
+
+def _save_in_background(save: Callable[[Dict[str, Any]], bool], kind: str, data: Dict[str, Any]) -> bool:
+    """Journal a record synchronously, then queue its workbook save (utils.xlsx writes saves behind). Returns False if either step failed."""
+    line = orjson.dumps({"kind": kind, "recorded_at": datetime.now().isoformat(sep=" ", timespec="seconds"), "data": data}) + b"\n"
+    try:
+        with _JOURNAL_LOCK:
+            if os.path.exists(JOURNAL_FILE) and os.path.getsize(JOURNAL_FILE) >= JOURNAL_MAX_BYTES:
+                os.replace(JOURNAL_FILE, f"{JOURNAL_FILE}.1")
+            with open(JOURNAL_FILE, "ab") as journal:
+                journal.write(line)
+    except OSError as e:
+        print(f"Error journaling {kind}: {e}")
+        return False
+    return save(data)
+
+# Grade descriptions that route a student to the university WhatsApp group
+_UNIVERSITY_GRADE_RE = re.compile(r"university|bachelor|master|phd|undergraduate|graduate", re.IGNORECASE)
+
+# Loose shape check only; the team confirms contact details when they follow up
+_EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+def _validate(data: Dict[str, Any], required: tuple) -> str:
+    """
+    Check tool arguments before recording them. Types are already enforced by the tool's args schema.
+    
+    Args:
+        data: Dictionary containing the tool arguments
+        required: Names of the fields that must not be blank
+        
+    Returns:
+        str: Error message for the user, or an empty string if the data is valid
+    """
+    missing = [field for field in required if not str(data.get(field, "")).strip()]
+    if missing:
+        return f"❌ Missing required information: {', '.join(missing)}. Please provide it and try again."
+    if data.get("email") and not _EMAIL_RE.match(data["email"].strip()):
+        return f"❌ '{data['email']}' does not look like a valid email address. Please check it and try again."
+    return ""
+
 @tool
 def record_students_lead(
     name: str,
@@ -28,31 +78,28 @@ def record_students_lead(
     Returns:
         str: Success or error message
     """
-    try:
-        data = {
-            'name': name,
-            'email': email,
-            'language': language,
-            'subjects': subjects,
-            'grade': grade,
-            'location': location,
-            'contact_info': contact_info
-        }
-        
-        success = save_student_lead(data)
+    data = {
+        'name': name,
+        'email': email,
+        'language': language,
+        'subjects': subjects,
+        'grade': grade,
+        'location': location,
+        'contact_info': contact_info
+    }
+    
+    error = _validate(data, ('name', 'email', 'language', 'subjects', 'grade', 'location'))
+    if error:
+        return error
+    
+    success = _save_in_background(save_student_lead, "student_lead", data)
+    
+    if success:
+        whatsapp_group = "taleb w istez" if _UNIVERSITY_GRADE_RE.search(grade) else "telmiz w istez"
         
-        if success:
-            if "university" in grade.lower() or any(term in grade.lower() for term in ["bachelor", "master", "phd", "undergraduate", "graduate"]):
-                whatsapp_group = "taleb w istez"
-            else:
-                whatsapp_group = "telmiz w istez"
-                
-            return f"✅ Student lead recorded successfully! Your information has been saved and you'll be matched with qualified teachers through our '{whatsapp_group}' WhatsApp group. Remember, this service is completely free for students - teachers only pay when they get their first paycheck. You'll be contacted soon with potential matches!"
-        else:
-            return "❌ Sorry, there was an error recording your information. Please try again or contact our support team."
-            
-    except Exception as e:
-        return f"❌ Error: {str(e)}. Please check your information and try again."
+        return f"✅ Student lead recorded successfully! Your information has been saved and you'll be matched with qualified teachers through our '{whatsapp_group}' WhatsApp group. Remember, this service is completely free for students - teachers only pay when they get their first paycheck. You'll be contacted soon with potential matches!"
+    else:
+        return "❌ Sorry, there was an error recording your information. Please try again or contact our support team."
 
 @tool
 def record_workshops_lead(
@@ -87,30 +134,30 @@ def record_workshops_lead(
     Returns:
         str: Success or error message
     """
-    try:
-        data = {
-            'organization_name': organization_name,
-            'contact_person': contact_person,
-            'email': email,
-            'phone': phone,
-            'program_type': program_type,
-            'program_name': program_name,
-            'description': description,
-            'target_audience': target_audience,
-            'duration': duration,
-            'location': location,
-            'expected_participants': expected_participants
-        }
-        
-        success = save_workshop_lead(data)
-        
-        if success:
-            return f"✅ Workshop/program lead recorded successfully! Your '{program_name}' will be advertised through our 'motadareb w khabeer' WhatsApp group. Our commission is 10% per registered attendee. Our team will contact you within 24 hours to discuss the advertising strategy and timeline."
-        else:
-            return "❌ Sorry, there was an error recording your program information. Please try again or contact our support team."
-            
-    except Exception as e:
-        return f"❌ Error: {str(e)}. Please check your information and try again."
+    data = {
+        'organization_name': organization_name,
+        'contact_person': contact_person,
+        'email': email,
+        'phone': phone,
+        'program_type': program_type,
+        'program_name': program_name,
+        'description': description,
+        'target_audience': target_audience,
+        'duration': duration,
+        'location': location,
+        'expected_participants': expected_participants
+    }
+    
+    error = _validate(data, ('organization_name', 'contact_person', 'email', 'phone', 'program_type', 'program_name', 'description', 'target_audience', 'duration', 'location', 'expected_participants'))
+    if error:
+        return error
+    
+    success = _save_in_background(save_workshop_lead, "workshop_lead", data)
+    
+    if success:
+        return f"✅ Workshop/program lead recorded successfully! Your '{program_name}' will be advertised through our 'motadareb w khabeer' WhatsApp group. Our commission is 10% per registered attendee. Our team will contact you within 24 hours to discuss the advertising strategy and timeline."
+    else:
+        return "❌ Sorry, there was an error recording your program information. Please try again or contact our support team."
 
 @tool
 def record_feedback(
@@ -131,26 +178,26 @@ def record_feedback(
     Returns:
         str: Success message
     """
-    try:
-        data = {
-            'user_question': user_question,
-            'category': category,
-            'urgency': urgency,
-            'contact_info': contact_info
-        }
-        
-        success = save_feedback(data)
-        
-        if success:
-            return "✅ Thank you for your feedback! Your question has been recorded and our team will review it. If you provided contact information, we'll get back to you as soon as possible. In the meantime, feel free to ask other questions about our services!"
-        else:
-            return "❌ Sorry, there was an error recording your feedback. Please try again or contact our support team directly."
-            
-    except Exception as e:
-        return f"❌ Error recording feedback: {str(e)}"
+    data = {
+        'user_question': user_question,
+        'category': category,
+        'urgency': urgency,
+        'contact_info': contact_info
+    }
+    
+    error = _validate(data, ('user_question',))
+    if error:
+        return error
+    
+    success = _save_in_background(save_feedback, "feedback", data)
+    
+    if success:
+        return "✅ Thank you for your feedback! Your question has been recorded and our team will review it. If you provided contact information, we'll get back to you as soon as possible. In the meantime, feel free to ask other questions about our services!"
+    else:
+        return "❌ Sorry, there was an error recording your feedback. Please try again or contact our support team directly."
 
-# Function definitions for OpenAI API tools
-TOOLS_DEFINITIONS = [
+# Function definitions for OpenAI API tools; a tuple so the same object is shared, never rebuilt or mutated
+TOOLS_DEFINITIONS = (
     {
         "type": "function",
         "function": {
@@ -280,7 +327,7 @@ TOOLS_DEFINITIONS = [
             }
         }
     }
-]
+)
 
 # Available functions mapping
 AVAILABLE_FUNCTIONS = {
@@ -1,135 +1,441 @@
 import openai
+import httpx
 import os
-import json
-from typing import List, Dict, Any, Optional
+import orjson
+import asyncio
+import atexit
+import functools
+import hashlib
+import itertools
+import logging
+import re
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import List, Dict, Any, Iterator, Optional
 from dotenv import load_dotenv
 from agents.tools import TOOLS_DEFINITIONS, AVAILABLE_FUNCTIONS
+from agents.history import Turn, as_turns
+from utils.files import read_text
 from agents.tools import record_students_lead, record_workshops_lead, record_feedback
 
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Shared keep-alive connection pool so consecutive turns reuse warm TLS connections
+_SHARED_HTTPX = httpx.Client(
+    timeout=60.0,
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=16, max_connections=32, keepalive_expiry=180.0)
+)
+atexit.register(_SHARED_HTTPX.close)
+
+# Worker threads for running the tool calls of one turn concurrently in the synchronous path
+_TOOL_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="eduzen-tool")
+
+# Concurrent sessions can hit OpenAI rate limits; the SDK retries 429s with exponential backoff
+# and honours Retry-After, so allow more attempts than its default of two
+MAX_RETRIES = 5
+
+@functools.lru_cache(maxsize=None)
+def _get_client() -> openai.OpenAI:
+    # One client for every agent in the process; created on first use so importing without an API key still works
+    return openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=_SHARED_HTTPX, max_retries=MAX_RETRIES)
+
+# The async client's connection pool is bound to the event loop it first ran on, so chat_async
+# shares one client per running loop; a client goes away together with its loop
+_ASYNC_CLIENTS = weakref.WeakKeyDictionary()
+_ASYNC_CLIENTS_LOCK = threading.Lock()
+
+def _get_async_client() -> openai.AsyncOpenAI:
+    # Must be called from a coroutine; raises RuntimeError otherwise
+    loop = asyncio.get_running_loop()
+    with _ASYNC_CLIENTS_LOCK:
+        client = _ASYNC_CLIENTS.get(loop)
+        if client is None:
+            client = _ASYNC_CLIENTS[loop] = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=MAX_RETRIES)
+        return client
+
+# Replies are mostly short; cap generation by intent and cut off run-on completions that start a new turn
+GREETING_MAX_TOKENS = 200
+DEFAULT_MAX_TOKENS = 600
+STOP_SEQUENCES = ["\nUser:", "\nHuman:"]
+_GREETING_RE = re.compile(r"^\W*(hi|hello|hey|thanks|thank you|good (morning|afternoon|evening))\b", re.IGNORECASE)
+
+def _max_tokens_for(message: str) -> int:
+    # Only short greetings/thanks get the small budget; questions and lead details may need a full answer
+    if len(message.split()) <= 4 and _GREETING_RE.match(message):
+        return GREETING_MAX_TOKENS
+    return DEFAULT_MAX_TOKENS
+
+# Only the most recent turns are sent to the model, so prompt size stops growing with the session
+HISTORY_WINDOW = int(os.getenv("EDUZEN_HISTORY_WINDOW", "8"))
+
+# Per-session response cache: a question the user already asked in this session ("what are your services?")
+# is answered again from memory, whatever the temperature. The key is the question with case and spacing
+# normalized, so a repeat hits even right after the first ask. Turns that called tools are never cached:
+# their arguments can come from anywhere in the conversation.
+RESPONSE_CACHE_SIZE = 256
+
+# Tool replies starting with these are already written for the user (see agents/tools.py)
+TOOL_ACK_PREFIXES = ("✅", "❌")
+
+# Tool outputs by (function, arguments), so a repeated submission is not recorded twice
+ACTION_CACHE_SIZE = 256
+
+def _action_key(function_name: str, function_args: Dict[str, Any]) -> Optional[tuple]:
+    # Tool arguments are flat string mappings, so they hash directly without serializing;
+    # anything nested is simply not cached
+    try:
+        key = (function_name, frozenset(function_args.items()))
+        hash(key)
+        return key
+    except TypeError:
+        return None
+
+# Prompt files are static, so they are read and assembled once per process
+@functools.lru_cache(maxsize=None)
+def _load_business_summary() -> str:
+    try:
+        return read_text(os.path.join("..", "me", "business_summary.txt"))
+    except FileNotFoundError:
+        return "EduZen Agency - Educational services provider"
+
+@functools.lru_cache(maxsize=None)
+def _load_instructions() -> str:
+    try:
+        return read_text(os.path.join("..", "prompts", "instructions.txt"))
+    except FileNotFoundError:
+        return "Provide helpful assistance with educational services."
+
+@functools.lru_cache(maxsize=None)
+def _load_personality(personality: str) -> str:
+    try:
+        return read_text(os.path.join("..", "prompts", "personalities", f"{personality}.txt"))
+    except FileNotFoundError:
+        return "Be helpful and professional."
+
+@functools.lru_cache(maxsize=None)
+def _build_system_prompt(personality: str) -> str:
+    return f"{_load_business_summary()}\n\n{_load_instructions()}\n\n{_load_personality(personality)}"
+
+@functools.lru_cache(maxsize=None)
+def _build_system_messages(personality: str) -> tuple:
+    # Largest, most static block first so the prompt prefix stays byte-identical across turns,
+    # which lets OpenAI's automatic prompt caching reuse it
+    return (
+        {"role": "system", "content": _load_business_summary()},
+        {"role": "system", "content": f"{_load_instructions()}\n\n{_load_personality(personality)}"}
+    )
+
+def _known_personalities() -> List[str]:
+    try:
+        return sorted(os.path.splitext(name)[0] for name in os.listdir(os.path.join("..", "prompts", "personalities")) if name.endswith(".txt"))
+    except FileNotFoundError:
+        return []
+
+# Every shipped personality is assembled at import, so creating an agent is a dict lookup
+_SYSTEM_PROMPTS = {personality: _build_system_prompt(personality) for personality in _known_personalities()}
+_SYSTEM_MESSAGES = {personality: _build_system_messages(personality) for personality in _SYSTEM_PROMPTS}
+
+@functools.lru_cache(maxsize=1024)
+def _turn_messages(turn: Turn) -> tuple:
+    # Turns are immutable, so each one is converted to API messages once and reused on every later turn
+    return (
+        {"role": "user", "content": turn.user},
+        {"role": "assistant", "content": turn.assistant}
+    )
+
+class _LRUCache:
+    """Small thread-safe LRU mapping."""
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Any:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
 class EduZenVanillaAgent:
-    def __init__(self, personality="formal"):
-        self.client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    def __init__(self, personality="formal", temperature=0.7):
+        self.client = _get_client()
         self.personality = personality
-        self.business_summary = self._load_business_summary()
-        self.instructions = self._load_instructions()
-        self.personality_style = self._load_personality(personality)
-        self.system_prompt = self._create_system_prompt()
+        self.temperature = temperature
+        # When every tool reply is already user-facing, return it instead of asking the model to reword it
+        self.short_circuit_tool_acks = True
+        self._response_cache = _LRUCache(RESPONSE_CACHE_SIZE)
+        self._action_cache = _LRUCache(ACTION_CACHE_SIZE)
+        self.business_summary = _load_business_summary()
+        self.instructions = _load_instructions()
+        self.personality_style = _load_personality(personality)
+        self.system_prompt = _SYSTEM_PROMPTS.get(personality) or _build_system_prompt(personality)
+        self.system_messages = _SYSTEM_MESSAGES.get(personality) or _build_system_messages(personality)
         
-    def _load_business_summary(self) -> str:
-        try:
-            file_path = os.path.join("..", "me", "business_summary.txt")
-            with open(file_path, "r", encoding="utf-8") as f:
-                return f.read().strip()
-        except FileNotFoundError:
-            return "EduZen Agency - Educational services provider"
-    
-    def _load_instructions(self) -> str:
-        try:
-            file_path = os.path.join("..", "prompts", "instructions.txt")
-            with open(file_path, "r", encoding="utf-8") as f:
-                return f.read().strip()
-        except FileNotFoundError:
-            return "Provide helpful assistance with educational services."
-    
-    def _load_personality(self, personality: str) -> str:
-        try:
-            file_path = os.path.join("..", "prompts", "personalities", f"{personality}.txt")
-            with open(file_path, "r", encoding="utf-8") as f:
-                return f.read().strip()
-        except FileNotFoundError:
-            return "Be helpful and professional."
+    @classmethod
+    def warmup(cls) -> None:
+        """Open a pooled connection in the background so the first turn skips the handshake."""
+        def _ping():
+            try:
+                _get_client().models.list()
+            except Exception as e:
+                print(f"Warmup request failed: {e}")
+        threading.Thread(target=_ping, daemon=True).start()
+
+    def _build_messages(self, message: str, history: List[Turn]) -> List[Any]:
+        # System prompt, the last HISTORY_WINDOW turns, then the current message
+        recent_history = history[-HISTORY_WINDOW:] if HISTORY_WINDOW > 0 else ()
+        return list(itertools.chain(
+            self.system_messages,
+            itertools.chain.from_iterable(map(_turn_messages, recent_history)),
+            ({"role": "user", "content": message},)
+        ))
+
+    def _run_tool_call(self, tool_call, use_cache: bool = True) -> Optional[Dict[str, Any]]:
+        function_name = tool_call.function.name
+        function_args = orjson.loads(tool_call.function.arguments)
+        
+        if function_name not in AVAILABLE_FUNCTIONS:
+            return None
+        
+        action_key = _action_key(function_name, function_args) if use_cache else None
+        function_response = self._action_cache.get(action_key) if action_key else None
+        if function_response is not None:
+            logger.info("Action cache hit for %s, tool call skipped", function_name)
+        else:
+            tool = AVAILABLE_FUNCTIONS[function_name]
+            function_response = tool.invoke(function_args)
+            # Only successful recordings are remembered; failures and validation errors must be retried
+            if action_key and isinstance(function_response, str) and function_response.startswith("✅"):
+                self._action_cache.put(action_key, function_response)
+        return {
+            "tool_call_id": tool_call.id,
+            "role": "tool",
+            "name": function_name,
+            "content": function_response
+        }
+
+    def _response_cache_key(self, message: str, use_cache: bool, session_id: str) -> Optional[bytes]:
+        if not use_cache:
+            return None
+        question = " ".join(message.casefold().split())
+        payload = orjson.dumps([session_id, self.system_prompt, question])
+        return hashlib.blake2b(payload, digest_size=16).digest()
+
+    def _get_cached_response(self, cache_key: Optional[bytes]) -> Optional[str]:
+        if cache_key is None:
+            return None
+        response = self._response_cache.get(cache_key)
+        if response is not None:
+            logger.info("Response cache hit, completion calls skipped")
+        return response
+
+    def _cache_response(self, cache_key: Optional[bytes], agent_response: str) -> None:
+        if cache_key is not None and agent_response:
+            self._response_cache.put(cache_key, agent_response)
 
-    def _create_system_prompt(self) -> str:
-         return f" {self.business_summary} \n {self.instructions} \n {self.personality_style}"
+    def _tool_acknowledgement(self, tool_messages: List[Dict[str, Any]]) -> Optional[str]:
+        """Joined tool replies if they can be returned as the final answer, otherwise None."""
+        if not self.short_circuit_tool_acks or not tool_messages:
+            return None
+        tool_responses = [tool_message["content"] for tool_message in tool_messages]
+        if all(isinstance(response, str) and response.startswith(TOOL_ACK_PREFIXES) for response in tool_responses):
+            return "\n\n".join(tool_responses)
+        return None
 
-    def chat(self, message: str, history: List[Dict[str, str]] = None) -> tuple[str, List[Dict[str, str]]]:
+    def _record_exchange(self, message: str, agent_response: str, history: List[Turn]) -> List[Turn]:
+        # Update history in place with the new exchange
+        history.append(Turn(message, agent_response))
+        return history
+
+    def chat(self, message: str, history: List[Turn] = None, use_cache: bool = True, session_id: str = "default") -> tuple[str, List[Turn]]:
+        """Answer a message. The given history list is extended in place and returned."""
         if history is None:
             history = []
         
-        # Prepare messages for OpenAI
-        messages = [{"role": "system", "content": self.system_prompt}]
+        agent_response = ""
+        for agent_response in self.chat_stream(message, history, use_cache, session_id):
+            pass
+        return agent_response, history
+
+    def chat_stream(self, message: str, history: List[Turn] = None, use_cache: bool = True, session_id: str = "default") -> Iterator[str]:
+        """
+        Answer a message, yielding the response text as it grows. History is extended once the stream is exhausted.
+        Cached responses are only shared between calls with the same session_id.
+        """
+        if history is None:
+            history = []
         
-        # Add conversation history
-        for exchange in history:
-            messages.append({"role": "user", "content": exchange.get("user", "")})
-            messages.append({"role": "assistant", "content": exchange.get("assistant", "")})
+        agent_response = ""
         
-        # Add current message
-        messages.append({"role": "user", "content": message})
+        try:
+            # Older callers pass {"user": ..., "assistant": ...} dicts
+            as_turns(history)
+            cache_key = self._response_cache_key(message, use_cache, session_id)
+            cached_response = self._get_cached_response(cache_key)
+            if cached_response is not None:
+                yield cached_response
+                self._record_exchange(message, cached_response, history)
+                return
+            
+            messages = self._build_messages(message, history)
+            max_tokens = _max_tokens_for(message)
+            
+            # First API call, streamed as well: plain replies reach the user token by token,
+            # while tool call fragments are collected until the stream ends
+            stream = self.client.chat.completions.create(
+                model="gpt-4",
+                messages=messages,
+                tools=TOOLS_DEFINITIONS,
+                tool_choice="auto",
+                temperature=self.temperature,
+                max_tokens=max_tokens,
+                stop=STOP_SEQUENCES,
+                stream=True
+            )
+            
+            tool_calls = {}
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    agent_response += delta.content
+                    yield agent_response
+                for tool_call_delta in delta.tool_calls or ():
+                    tool_call = tool_calls.setdefault(tool_call_delta.index, {"id": "", "name": "", "arguments": ""})
+                    tool_call["id"] = tool_call_delta.id or tool_call["id"]
+                    if tool_call_delta.function:
+                        tool_call["name"] += tool_call_delta.function.name or ""
+                        tool_call["arguments"] += tool_call_delta.function.arguments or ""
+            
+            # Check if the model wants to call a function
+            if tool_calls:
+                tool_calls = [
+                    SimpleNamespace(id=tool_call["id"], function=SimpleNamespace(name=tool_call["name"], arguments=tool_call["arguments"]))
+                    for _, tool_call in sorted(tool_calls.items())
+                ]
+                
+                # Add the assistant's response and the function responses to messages;
+                # tools do blocking I/O, so run them concurrently (map keeps the call order)
+                messages.append({
+                    "role": "assistant",
+                    "content": agent_response or None,
+                    "tool_calls": [
+                        {"id": tool_call.id, "type": "function", "function": vars(tool_call.function)}
+                        for tool_call in tool_calls
+                    ]
+                })
+                tool_messages = _TOOL_POOL.map(self._run_tool_call, tool_calls, itertools.repeat(use_cache))
+                tool_messages = [tool_message for tool_message in tool_messages if tool_message is not None]
+                messages.extend(tool_messages)
+                
+                acknowledgement = self._tool_acknowledgement(tool_messages)
+                if acknowledgement is not None:
+                    agent_response = acknowledgement
+                    yield agent_response
+                else:
+                    # Stream the final response from the model
+                    stream = self.client.chat.completions.create(
+                        model="gpt-4",
+                        messages=messages,
+                        temperature=self.temperature,
+                        max_tokens=max_tokens,
+                        stop=STOP_SEQUENCES,
+                        stream=True
+                    )
+                    
+                    agent_response = ""
+                    for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            agent_response += chunk.choices[0].delta.content
+                            yield agent_response
+            
+            if not tool_calls:
+                self._cache_response(cache_key, agent_response)
+                
+        except Exception as e:
+            agent_response = f"I apologize, but I encountered an error: {str(e)}. Please try again or contact our support team."
+            yield agent_response
+        
+        # History is updated even with errors
+        self._record_exchange(message, agent_response, history)
+
+    async def chat_async(self, message: str, history: List[Turn] = None, use_cache: bool = True, session_id: str = "default") -> tuple[str, List[Turn]]:
+        """Async variant of chat() that runs the requested tool calls concurrently."""
+        if history is None:
+            history = []
         
         try:
-            # First API call to get response and potential tool calls
-            response = self.client.chat.completions.create(
+            # Older callers pass {"user": ..., "assistant": ...} dicts
+            as_turns(history)
+            cache_key = self._response_cache_key(message, use_cache, session_id)
+            cached_response = self._get_cached_response(cache_key)
+            if cached_response is not None:
+                return cached_response, self._record_exchange(message, cached_response, history)
+            
+            messages = self._build_messages(message, history)
+            max_tokens = _max_tokens_for(message)
+            async_client = _get_async_client()
+            
+            response = await async_client.chat.completions.create(
                 model="gpt-4",
                 messages=messages,
                 tools=TOOLS_DEFINITIONS,
                 tool_choice="auto",
-                temperature=0.7,
-                max_tokens=1000
+                temperature=self.temperature,
+                max_tokens=max_tokens,
+                stop=STOP_SEQUENCES
             )
             
             response_message = response.choices[0].message
-            agent_response = ""
             
-            # Check if the model wants to call a function
             if response_message.tool_calls:
-                # Add the assistant's response to messages
                 messages.append(response_message)
                 
-                # Process each tool call
-                for tool_call in response_message.tool_calls:
-                    function_name = tool_call.function.name
-                    function_args = json.loads(tool_call.function.arguments)
-                    
-                    # Call the function
-                    if function_name in AVAILABLE_FUNCTIONS:
-                        tool = AVAILABLE_FUNCTIONS[function_name]
-                        function_response = tool.invoke(function_args)
-                        
-                        # Add function response to messages
-                        messages.append({
-                            "tool_call_id": tool_call.id,
-                            "role": "tool",
-                            "name": function_name,
-                            "content": function_response
-                        })
-                
-                # Get final response from the model
-                final_response = self.client.chat.completions.create(
-                    model="gpt-4",
-                    messages=messages,
-                    temperature=0.7,
-                    max_tokens=1000
-                )
+                # Tools do blocking I/O, so run each one in a worker thread; gather keeps the call order
+                tool_messages = await asyncio.gather(*(
+                    asyncio.to_thread(self._run_tool_call, tool_call, use_cache)
+                    for tool_call in response_message.tool_calls
+                ))
+                tool_messages = [tool_message for tool_message in tool_messages if tool_message is not None]
+                messages.extend(tool_messages)
                 
-                agent_response = final_response.choices[0].message.content
+                agent_response = self._tool_acknowledgement(tool_messages)
+                if agent_response is None:
+                    final_response = await async_client.chat.completions.create(
+                        model="gpt-4",
+                        messages=messages,
+                        temperature=self.temperature,
+                        max_tokens=max_tokens,
+                        stop=STOP_SEQUENCES
+                    )
+                    
+                    agent_response = final_response.choices[0].message.content
             
             else:
-                # No tool calls, return the response directly
                 agent_response = response_message.content
-            
-            # Update history with the new exchange
-            updated_history = history.copy()
-            updated_history.append({
-                "user": message,
-                "assistant": agent_response
-            })
-            
-            return agent_response, updated_history
+                self._cache_response(cache_key, agent_response)
                 
         except Exception as e:
-            error_message = f"I apologize, but I encountered an error: {str(e)}. Please try again or contact our support team."
-            # Still update history even with errors
-            updated_history = history.copy()
-            updated_history.append({
-                "user": message,
-                "assistant": error_message
-            })
-            return error_message, updated_history
-
-def create_agent(personality: str = "formal") -> EduZenVanillaAgent:
-    return EduZenVanillaAgent(personality)
\ No newline at end of file
+            agent_response = f"I apologize, but I encountered an error: {str(e)}. Please try again or contact our support team."
+        
+        return agent_response, self._record_exchange(message, agent_response, history)
+
+def create_agent(personality: str = "formal", temperature: float = 0.7) -> EduZenVanillaAgent:
+    return EduZenVanillaAgent(personality, temperature)
\ No newline at end of file
@@ -1,9 +1,16 @@
+from __future__ import annotations
+
 import gradio as gr
-from agents.vanilla_agent import create_agent as create_vanilla_agent
-from agents.react_lg_agent import create_agent as create_react_agent
-from typing import List, Tuple, Dict
-import pandas as pd
-from utils.xlsx import get_student_leads, get_workshop_leads, get_feedback_data
+import asyncio
+import functools
+import os
+from agents.history import Turn
+from typing import TYPE_CHECKING, List, Tuple, Dict, Iterator, Optional
+from utils.xlsx import TABLES, load
+
+# Agents and pandas are imported where they are used, so startup only loads what the chosen agent needs
+if TYPE_CHECKING:
+    import pandas as pd
 
 # Global variables for agent management
 current_agent = None
@@ -15,10 +22,13 @@ def initialize_agent(agent_type: str, personality: str = "formal"):
     global current_agent, current_agent_type, current_personality
     
     if agent_type == "vanilla":
+        from agents.vanilla_agent import create_agent as create_vanilla_agent
         current_agent = create_vanilla_agent()
+        current_agent.warmup()
         current_agent_type = "vanilla"
         current_personality = None
     elif agent_type == "react":
+        from agents.react_lg_agent import create_agent as create_react_agent
         current_agent = create_react_agent(personality)
         current_agent_type = "react"
         current_personality = personality
@@ -27,96 +37,124 @@ def initialize_agent(agent_type: str, personality: str = "formal"):
     
     return f"✅ Initialized {agent_type} agent" + (f" with {personality} personality" if personality else "")
 
-def chat_interface(message: str, history: List[List[str]]) -> Tuple[str, List[List[str]]]:
+def _format_react_response(final_answer: str, reasoning_steps: Tuple[str, ...]) -> str:
+    """Format the response to show both reasoning and final answer."""
+    if not reasoning_steps:
+        return final_answer
+    steps = "\n".join(f"{i}. {step}" for i, step in enumerate(reasoning_steps, 1))
+    return f"**Reasoning:**\n{steps}\n\n**Response:**\n{final_answer}"
+
+def _session_id(request: Optional[gr.Request]) -> str:
+    """Identifier of the browser session behind a request, or "default" outside Gradio."""
+    return getattr(request, "session_hash", None) or "default"
+
+def chat_interface(message: str, history: List[List[str]], agent_history: List[Turn], request: gr.Request = None) -> Iterator[Tuple[str, List[List[str]], List[Turn]]]:
     """
     Chat interface function for Gradio.
     
     Args:
         message: User's current message
         history: Chat history in Gradio format
+        agent_history: The same conversation as agent turns, kept in session state and extended in place
+        request: Gradio request, injected by Gradio; its session hash keeps sessions apart in the shared agent
         
-    Returns:
-        Tuple of (response, updated_history)
+    Yields:
+        Tuple of (cleared message box, updated_history, agent_history) as the response streams in
     """
     global current_agent
     
     if current_agent is None:
         error_response = "❌ No agent initialized. Please select an agent type first."
         history.append([message, error_response])
-        return "", history
+        yield "", history, agent_history
+        return
+    
+    session_id = _session_id(request)
     
     try:
-        # Convert Gradio history format to our format
-        formatted_history = []
-        for exchange in history:
-            if len(exchange) >= 2:
-                formatted_history.append({
-                    "user": exchange[0],
-                    "assistant": exchange[1]
-                })
-        
         # Get response from agent based on type
         if current_agent_type == "vanilla":
-            response, updated_agent_history = current_agent.chat(message, formatted_history)
+            # Stream the response into the last Gradio history entry; the agent records the turn when done
+            history.append([message, ""])
+            for partial_response in current_agent.chat_stream(message, agent_history, session_id=session_id):
+                history[-1][1] = partial_response
+                yield "", history, agent_history
+            return
         elif current_agent_type == "react":
-            (final_answer, reasoning_steps), updated_agent_history = current_agent.chat_with_history(message, formatted_history)
-            # Format the response to show both reasoning and final answer
-            if reasoning_steps:
-                response = f"**Reasoning:**\n"
-                for i, step in enumerate(reasoning_steps, 1):
-                    response += f"{i}. {step}\n"
-                response += f"\n**Response:**\n{final_answer}"
-            else:
-                response = final_answer
+            # Show reasoning steps as each graph step finishes, then the final answer.
+            # Each browser session gets its own checkpoint thread, so concurrent runs never share memory.
+            history.append([message, ""])
+            final_answer, reasoning_steps = "", ()
+            for final_answer, reasoning_steps in current_agent.chat_stream(message, thread_id=session_id):
+                history[-1][1] = _format_react_response(final_answer, reasoning_steps)
+                yield "", history, agent_history
+            agent_history.append(Turn(message, final_answer, reasoning_steps))
+            yield "", history, agent_history
+            return
         else:
             raise ValueError(f"Unknown agent type: {current_agent_type}")
         
-        # Update Gradio history format
-        history.append([message, response])
-        
-        return "", history
-        
     except Exception as e:
         error_response = f"I apologize, but I encountered an error: {str(e)}. Please try again."
         history.append([message, error_response])
-        return "", history
+        yield "", history, agent_history
 
-def view_student_leads() -> str:
-    """View all student leads in a formatted table."""
-    try:
-        df = get_student_leads()
-        if df is not None and not df.empty:
-            return df.to_html(index=False, escape=False, classes="table table-striped")
-        else:
-            return "<p>No student leads found.</p>"
-    except Exception as e:
-        return f"<p>Error loading student leads: {str(e)}</p>"
+# Tables show up to this many rows (head and tail); the full file is available through the download button
+MAX_RENDERED_ROWS = 100
 
-def view_workshop_leads() -> str:
-    """View all workshop leads in a formatted table."""
-    try:
-        df = get_workshop_leads()
-        if df is not None and not df.empty:
-            return df.to_html(index=False, escape=False, classes="table table-striped")
-        else:
-            return "<p>No workshop leads found.</p>"
-    except Exception as e:
-        return f"<p>Error loading workshop leads: {str(e)}</p>"
+# The first read of a table parses its Excel file, so the async views run this in a worker thread
+# to keep the event loop free. Not cached here: load() serves rows from memory and reuses its
+# DataFrame until the next save, so rows recorded moments ago show up before they reach the file.
+def _load_preview(kind: str) -> Tuple[Optional[pd.DataFrame], str]:
+    """Read a table into a bounded preview and caption."""
+    import pandas as pd
+    
+    df = load(kind)
+    if df is None or df.empty:
+        return None, ""
+    total = len(df)
+    if total <= MAX_RENDERED_ROWS:
+        return df.fillna(""), f"{total} rows"
+    # Oldest and newest rows, so fresh leads stay visible as the file grows
+    half = MAX_RENDERED_ROWS // 2
+    preview = pd.concat([df.head(half), df.tail(half)]).fillna("")
+    return preview, f"Showing the first {half} and last {half} of {total} rows. Download the file to see all of them."
 
-def view_feedback() -> str:
-    """View all feedback in a formatted table."""
+def download_leads(path: str) -> Optional[str]:
+    """Return the leads file for download, or None if it does not exist yet."""
+    return path if os.path.exists(path) else None
+
+# The tables are gr.Dataframe components: the rows travel as JSON and the browser builds the table
+async def view_table(kind: str) -> Tuple[Optional[pd.DataFrame], str]:
+    """View all records of a table (a key of utils.xlsx.TABLES), with a caption."""
+    spec = TABLES[kind]
     try:
-        df = get_feedback_data()
-        if df is not None and not df.empty:
-            return df.to_html(index=False, escape=False, classes="table table-striped")
-        else:
-            return "<p>No feedback found.</p>"
+        table, caption = await asyncio.to_thread(_load_preview, kind)
+        return (table, caption) if table is not None else (None, f"No {spec.title} found.")
     except Exception as e:
-        return f"<p>Error loading feedback: {str(e)}</p>"
+        return None, f"Error loading {spec.title}: {str(e)}"
+
+async def view_student_leads() -> Tuple[Optional[pd.DataFrame], str]:
+    """View all student leads in a table, with a caption."""
+    return await view_table("student")
+
+async def view_workshop_leads() -> Tuple[Optional[pd.DataFrame], str]:
+    """View all workshop leads in a table, with a caption."""
+    return await view_table("workshop")
+
+async def view_feedback() -> Tuple[Optional[pd.DataFrame], str]:
+    """View all feedback in a table, with a caption."""
+    return await view_table("feedback")
 
 # Removed export_leads function - not needed in simplified interface
 
-# Create the Gradio interface
+# Table refreshes are served from load()'s in-memory rows and only the first one parses the file,
+# but each still serializes up to MAX_RENDERED_ROWS rows, so a few at a time is enough;
+# chat events use the queue's default limit set in launch_interface
+VIEW_CONCURRENCY_LIMIT = 4
+
+# Create the Gradio interface; built once per process and reused by later calls
+@functools.lru_cache(maxsize=1)
 def create_interface():
     """Create and configure the simple Gradio interface."""
     
@@ -175,6 +213,9 @@ def create_interface():
                     placeholder="Initialize an agent first, then start chatting..."
                 )
                 
+                # Conversation as agent turns, appended to each turn instead of rebuilt from the chatbot
+                agent_history = gr.State([])
+                
                 msg = gr.Textbox(
                     placeholder="Type your message here...",
                     label="Message",
@@ -203,27 +244,24 @@ def create_interface():
                 )
                 
                 # Event handlers
-                send_btn.click(chat_interface, [msg, chatbot], [msg, chatbot])
-                msg.submit(chat_interface, [msg, chatbot], [msg, chatbot])
-                clear_btn.click(lambda: (None, []), outputs=[msg, chatbot])
+                send_btn.click(chat_interface, [msg, chatbot, agent_history], [msg, chatbot, agent_history])
+                msg.submit(chat_interface, [msg, chatbot, agent_history], [msg, chatbot, agent_history])
+                clear_btn.click(lambda: (None, [], []), outputs=[msg, chatbot, agent_history])
             
-            # Student Leads Tab
-            with gr.TabItem("👨‍🎓 Student Leads"):
-                student_display = gr.HTML()
-                refresh_students = gr.Button("Refresh Data")
-                refresh_students.click(view_student_leads, outputs=student_display)
-                        
-            # Workshop Leads Tab
-            with gr.TabItem("🏫 Workshop Leads"):
-                workshop_display = gr.HTML()
-                refresh_workshops = gr.Button("Refresh Data")
-                refresh_workshops.click(view_workshop_leads, outputs=workshop_display)
-                        
-            # Feedback Tab
-            with gr.TabItem("💬 Feedback"):
-                feedback_display = gr.HTML()
-                refresh_feedback = gr.Button("Refresh Data")
-                refresh_feedback.click(view_feedback, outputs=feedback_display)
+            # Data tabs, one per table in utils.xlsx.TABLES
+            for kind, tab_label, view in (
+                ("student", "👨‍🎓 Student Leads", view_student_leads),
+                ("workshop", "🏫 Workshop Leads", view_workshop_leads),
+                ("feedback", "💬 Feedback", view_feedback)
+            ):
+                with gr.TabItem(tab_label):
+                    caption = gr.Markdown()
+                    display = gr.Dataframe(interactive=False, wrap=True)
+                    refresh = gr.Button("Refresh Data")
+                    refresh.click(view, outputs=[display, caption], queue=True, concurrency_limit=VIEW_CONCURRENCY_LIMIT)
+                    download = gr.Button("Download Full File")
+                    full_file = gr.File(label="Full File", interactive=False)
+                    download.click(functools.partial(download_leads, TABLES[kind].filename), outputs=full_file)
     
     return interface
 
@@ -247,7 +285,8 @@ def launch_interface(agent_type="vanilla", personality="formal", share=False, de
             print(f"❌ Failed to pre-initialize agent: {e}")
     
     interface = create_interface()
-    interface.launch(
+    # Turns are I/O bound, so let several sessions wait on OpenAI at once instead of one after another
+    interface.queue(default_concurrency_limit=16, max_size=64).launch(
         share=share,
         debug=debug,
         server_name="0.0.0.0",
@@ -0,0 +1,48 @@
+import pytest
+
+pytest.importorskip("langgraph")
+pytest.importorskip("langchain_openai")
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agents.react_lg_agent import EduZenReActAgent, _split_reasoning, create_agent
+
+
+@pytest.fixture(autouse=True)
+def fake_api_key(monkeypatch):
+    # Building an agent never calls OpenAI, it only needs a key to construct the clients
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+
+
+def test_create_agent_builds_graph():
+    agent = create_agent("formal")
+    assert isinstance(agent, EduZenReActAgent)
+    assert agent.graph is not None
+    assert agent.get_graph_state("smoke").values == {}
+
+
+def test_agents_keep_separate_memory():
+    first = create_agent("formal")
+    second = create_agent("casual")
+    assert first.graph is not second.graph
+    assert first.graph.checkpointer is not second.graph.checkpointer
+
+
+def test_split_reasoning_with_both_tags():
+    assert _split_reasoning("THINKING: greet them RESPONSE: Hello!") == ("greet them", "Hello!")
+
+
+def test_split_reasoning_without_response_tag_keeps_the_reply():
+    assert _split_reasoning("THINKING: Hello, how can I help?") == ("", "Hello, how can I help?")
+
+
+def test_split_reasoning_for_tool_calls_keeps_only_reasoning():
+    assert _split_reasoning("THINKING: record the lead", has_tool_calls=True) == ("record the lead", "")
+
+
+def test_graph_can_be_invoked_directly(monkeypatch):
+    agent = create_agent("formal")
+    monkeypatch.setattr(agent, "_agent_step", lambda state: {"messages": [AIMessage(content="Hello!")]})
+    result = agent.graph.invoke({"messages": [HumanMessage(content="Hi")]}, {"configurable": {"thread_id": "z"}})
+    assert result["messages"][-1].content == "Hello!"
+    assert agent.get_graph_state("z").values["messages"][-1].content == "Hello!"
@@ -0,0 +1,125 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("langchain_core")
+
+from agents import vanilla_agent
+from agents.history import Turn
+from agents.vanilla_agent import create_agent
+
+
+@pytest.fixture(autouse=True)
+def fake_api_key(monkeypatch):
+    # Building an agent never calls OpenAI, it only needs a key to construct the clients
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+
+
+def chunk(content=None, tool_calls=None):
+    delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+class FakeClient:
+    """Stands in for openai.OpenAI; every create() call streams the next scripted list of chunks."""
+    def __init__(self, *streams):
+        self.streams = list(streams)
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        return iter(self.streams.pop(0))
+
+
+class LoopBoundAsyncClient:
+    """Stands in for AsyncOpenAI, whose connection pool only works on the loop it was created on."""
+    def __init__(self, **kwargs):
+        self.loop = asyncio.get_running_loop()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        if asyncio.get_running_loop() is not self.loop:
+            raise RuntimeError("Event loop is closed")
+        message = SimpleNamespace(content="pong", tool_calls=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def test_chat_async_works_across_event_loops(monkeypatch):
+    monkeypatch.setattr(vanilla_agent.openai, "AsyncOpenAI", LoopBoundAsyncClient)
+    agent = create_agent("formal")
+    first, _ = asyncio.run(agent.chat_async("ping", use_cache=False))
+    second, history = asyncio.run(agent.chat_async("ping again", use_cache=False))
+    assert first == "pong"
+    assert second == "pong"
+    assert history[0].assistant == "pong"
+
+
+def test_chat_accepts_legacy_dict_history():
+    agent = create_agent("formal")
+    agent.client = FakeClient([chunk("Hel"), chunk("lo!")])
+    history = [{"user": "Hi", "assistant": "Hello, how can I help?"}]
+    response, history = agent.chat("Do you teach maths?", history, use_cache=False)
+    assert response == "Hello!"
+    assert history == [Turn("Hi", "Hello, how can I help?"), Turn("Do you teach maths?", "Hello!")]
+    sent = agent.client.requests[0]["messages"]
+    assert sent[-3:] == [
+        {"role": "user", "content": "Hi"},
+        {"role": "assistant", "content": "Hello, how can I help?"},
+        {"role": "user", "content": "Do you teach maths?"}
+    ]
+
+
+def test_repeated_question_is_answered_from_the_session_cache():
+    agent = create_agent("formal")
+    agent.client = FakeClient([chunk("We offer tutoring.")], [chunk("We offer workshops too.")])
+    first, history = agent.chat("What are your services?", session_id="a")
+    second, history = agent.chat("what are  your services? ", history, session_id="a")
+    assert second == first == "We offer tutoring."
+    assert len(agent.client.requests) == 1
+    assert len(history) == 2
+    # Other sessions never see it
+    other, _ = agent.chat("What are your services?", session_id="b")
+    assert other == "We offer workshops too."
+
+
+def tool_call_delta(index, id=None, name=None, arguments=None):
+    function = SimpleNamespace(name=name, arguments=arguments)
+    return SimpleNamespace(index=index, id=id, function=function)
+
+
+class FakeTool:
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = []
+
+    def invoke(self, arguments):
+        self.calls.append(arguments)
+        return self.reply
+
+
+def test_streamed_tool_calls_are_reassembled_and_acknowledged(monkeypatch):
+    students = FakeTool("✅ Student lead recorded.")
+    feedback = FakeTool("✅ Feedback recorded.")
+    monkeypatch.setitem(vanilla_agent.AVAILABLE_FUNCTIONS, "record_students_lead", students)
+    monkeypatch.setitem(vanilla_agent.AVAILABLE_FUNCTIONS, "record_feedback", feedback)
+    # Two tool calls in one turn, their arguments split across chunks and interleaved
+    stream = [
+        chunk(tool_calls=[tool_call_delta(0, id="call_1", name="record_students_lead", arguments='{"name": ')]),
+        chunk(tool_calls=[tool_call_delta(1, id="call_2", name="record_feedback", arguments='{"user_question"')]),
+        chunk(tool_calls=[tool_call_delta(0, arguments='"Lina", "email": ')]),
+        chunk(tool_calls=[tool_call_delta(1, arguments=': "Do you teach chemistry?"}')]),
+        chunk(tool_calls=[tool_call_delta(0, arguments='"lina@example.com"}')]),
+    ]
+    agent = create_agent("formal")
+    agent.client = FakeClient(stream)
+    response, history = agent.chat("I'm Lina, lina@example.com. Do you teach chemistry?")
+    
+    assert students.calls == [{"name": "Lina", "email": "lina@example.com"}]
+    assert feedback.calls == [{"user_question": "Do you teach chemistry?"}]
+    # Both replies are already written for the user, so the second completion is skipped
+    assert response == "✅ Student lead recorded.\n\n✅ Feedback recorded."
+    assert len(agent.client.requests) == 1
+    assert history == [Turn("I'm Lina, lina@example.com. Do you teach chemistry?", response)]
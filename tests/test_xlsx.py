@@ -0,0 +1,96 @@
+import glob
+import os
+import stat
+import threading
+import time
+
+import pytest
+
+openpyxl = pytest.importorskip("openpyxl")
+
+from utils import xlsx
+
+
+def clear_state():
+    for cache in (xlsx._WORKBOOKS, xlsx._ROWS, xlsx._COLUMNS, xlsx._FRAMES, xlsx._PENDING, xlsx._PENDING_HEADERS):
+        cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # Every test starts in an empty directory with no cached workbooks, rows or queued saves
+    monkeypatch.chdir(tmp_path)
+    clear_state()
+    yield tmp_path
+    clear_state()
+
+
+def test_save_keeps_existing_file_mode():
+    xlsx.initialize_excel_files()
+    os.chmod("feedback.xlsx", 0o640)
+    xlsx.save("feedback", {"user_question": "Do you teach chemistry?"})
+    xlsx.flush_pending_saves()
+    assert stat.S_IMODE(os.stat("feedback.xlsx").st_mode) == 0o640
+
+
+def test_new_file_gets_umask_mode():
+    xlsx.initialize_excel_files()
+    assert stat.S_IMODE(os.stat("feedback.xlsx").st_mode) == 0o666 & ~xlsx._UMASK
+
+
+def read_rows(filename):
+    workbook = openpyxl.load_workbook(filename)
+    return list(workbook.active.iter_rows(values_only=True))
+
+
+def test_saved_row_is_readable_before_it_is_flushed():
+    assert xlsx.save("student", {"name": "Lina", "email": "lina@example.com"})
+    df = xlsx.load("student")
+    assert list(df["name"]) == ["Lina"]
+    assert not os.path.exists("students_leads.xlsx")
+
+
+def test_flush_writes_queued_rows():
+    xlsx.save("student", {"name": "Lina"})
+    xlsx.save("student", {"name": "Omar"})
+    xlsx.flush_pending_saves()
+    rows = read_rows("students_leads.xlsx")
+    assert rows[0] == xlsx.STUDENT_COLUMNS
+    assert [row[0] for row in rows[1:]] == ["Lina", "Omar"]
+
+
+def test_existing_file_written_by_pandas_is_hydrated():
+    pd = pytest.importorskip("pandas")
+    pd.DataFrame([{"user_question": "Old question", "category": "general"}]).to_excel("feedback.xlsx", index=False)
+    xlsx.save("feedback", {"user_question": "New question"})
+    assert list(xlsx.load("feedback")["user_question"]) == ["Old question", "New question"]
+    xlsx.flush_pending_saves()
+    # New rows follow the file's own header order
+    assert [row[0] for row in read_rows("feedback.xlsx")] == ["user_question", "Old question", "New question"]
+
+
+def test_shutdown_waits_for_a_running_flush(monkeypatch):
+    started = threading.Event()
+    append_rows = xlsx._append_rows
+
+    def slow_append_rows(*args):
+        started.set()
+        time.sleep(0.3)
+        append_rows(*args)
+
+    monkeypatch.setattr(xlsx, "_append_rows", slow_append_rows)
+    monkeypatch.setattr(xlsx, "_STOP", threading.Event())
+    xlsx.save("student", {"name": "Lina"})
+    flush = threading.Thread(target=xlsx.flush_pending_saves)
+    flush.start()
+    assert started.wait(5)
+    xlsx._shutdown_writer()
+    assert [row[0] for row in read_rows("students_leads.xlsx")[1:]] == ["Lina"]
+    assert not glob.glob("*.xlsx.tmp")
+    flush.join()
+
+
+def test_orphaned_temp_files_are_removed():
+    open("feedback.xlsx.abc123.xlsx.tmp", "w").close()
+    xlsx.initialize_excel_files()
+    assert not glob.glob("*.xlsx.tmp")
@@ -0,0 +1,18 @@
+import sys
+import functools
+from pathlib import Path
+
+@functools.lru_cache(maxsize=32)
+def read_text(path: str) -> str:
+    """
+    Read and strip a text file once per process.
+    
+    The result is interned so every agent instance shares the same string.
+    
+    Args:
+        path: Path of the text file to read
+        
+    Returns:
+        str: The stripped file contents
+    """
+    return sys.intern(Path(path).read_text(encoding="utf-8").strip())
@@ -1,226 +1,316 @@
-import pandas as pd
+from __future__ import annotations
+
 import os
+import atexit
+import functools
+import glob
+import stat
+import tempfile
+import threading
+from collections import defaultdict
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import TYPE_CHECKING, Dict, Any, List, NamedTuple, Optional, Tuple
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+# pandas is only needed once a DataFrame is requested, so saving leads does not pay for importing it
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Column order of each file
+STUDENT_COLUMNS = ('name', 'email', 'language', 'subjects', 'grade', 'location', 'contact_info', 'timestamp')
+WORKSHOP_COLUMNS = (
+    'organization_name', 'contact_person', 'email', 'phone', 'program_type', 'program_name',
+    'description', 'target_audience', 'duration', 'location', 'expected_participants', 'timestamp'
+)
+FEEDBACK_COLUMNS = ('user_question', 'category', 'urgency', 'contact_info', 'timestamp')
+
+class TableSpec(NamedTuple):
+    filename: str
+    columns: Tuple[str, ...]
+    title: str
+
+# Every stored table; saves, reads and the interface tabs all dispatch through this
+TABLES = {
+    "student": TableSpec("students_leads.xlsx", STUDENT_COLUMNS, "student leads"),
+    "workshop": TableSpec("workshops_leads.xlsx", WORKSHOP_COLUMNS, "workshop leads"),
+    "feedback": TableSpec("feedback.xlsx", FEEDBACK_COLUMNS, "feedback")
+}
+
+# Suffix of the temporary files written by _save_atomic
+TEMP_SUFFIX = ".xlsx.tmp"
 
-def save_student_lead(data: Dict[str, Any], filename: str = "students_leads.xlsx") -> bool:
+def _remove_orphaned_temp_files(filename: str) -> None:
+    """Delete temporary files a killed process left next to a file. Call with _SAVE_LOCK held."""
+    for temp_path in glob.glob(f"{glob.escape(os.path.abspath(filename))}.*{TEMP_SUFFIX}"):
+        try:
+            os.remove(temp_path)
+        except OSError as e:
+            print(f"Error removing {temp_path}: {e}")
+
+# Saves append to the workbook and rewrite the file, so concurrent flushes must not interleave
+_SAVE_LOCK = threading.Lock()
+
+# The umask can only be read by setting it, which affects every thread, so it is read once at import
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def _file_mode(filename: str) -> int:
+    """Permission bits of an existing file, or those open() gives a new file under the umask."""
+    try:
+        return stat.S_IMODE(os.stat(filename).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+def _save_atomic(workbook: Workbook, filename: str) -> None:
     """
-    Save student lead data to Excel file.
-    
-    Args:
-        data: Dictionary containing student information
-        filename: Name of the Excel file to save to
-        
-    Returns:
-        bool: True if successful, False otherwise
+    Save a workbook through a temporary file in the same directory and swap it in, so readers
+    such as the download button never see a half-written file and a crash keeps the old one.
     """
+    directory, basename = os.path.split(os.path.abspath(filename))
+    fd, temp_path = tempfile.mkstemp(prefix=f"{basename}.", suffix=TEMP_SUFFIX, dir=directory)
+    os.close(fd)
     try:
-        # Add timestamp
-        data['timestamp'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        # Create DataFrame from the new data
-        new_df = pd.DataFrame([data])
-        
-        # Check if file exists
-        if os.path.exists(filename):
-            # Read existing data
-            existing_df = pd.read_excel(filename)
-            # Append new data
-            updated_df = pd.concat([existing_df, new_df], ignore_index=True)
-        else:
-            # Create new file with headers
-            updated_df = new_df
-        
-        # Save to Excel
-        updated_df.to_excel(filename, index=False)
-        return True
-        
-    except Exception as e:
-        print(f"Error saving student lead: {e}")
-        return False
+        workbook.save(temp_path)
+        # mkstemp creates the file as 0600; give it the mode the file has now, or a new file would get
+        os.chmod(temp_path, _file_mode(filename))
+        os.replace(temp_path, filename)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+def _new_workbook(headers: Tuple[str, ...]) -> Workbook:
+    """Create an in-memory workbook containing only the header row."""
+    workbook = Workbook()
+    workbook.active.append(headers)
+    return workbook
 
-def save_workshop_lead(data: Dict[str, Any], filename: str = "workshops_leads.xlsx") -> bool:
+# Workbooks stay loaded between flushes with their header order, so a flush only appends to the
+# in-memory sheet and saves it instead of parsing the whole file again. Guarded by _SAVE_LOCK.
+_WORKBOOKS: Dict[str, Tuple[Workbook, List[str]]] = {}
+
+def _append_rows(filename: str, rows: List[Dict[str, Any]], headers: Tuple[str, ...]) -> None:
     """
-    Save workshop/program lead data to Excel file.
+    Append rows to an Excel file without reading it into a DataFrame.
+    
+    Values are written in the order of the file's header row; a missing file is
+    created with the given headers first. The file is parsed on the first append
+    only and its workbook is reused afterwards.
     
     Args:
-        data: Dictionary containing workshop/program information
-        filename: Name of the Excel file to save to
-        
-    Returns:
-        bool: True if successful, False otherwise
+        filename: Name of the Excel file to append to
+        rows: Dictionaries containing the row values
+        headers: Column names used when the file does not exist yet
     """
-    try:
-        # Add timestamp
-        data['timestamp'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with _SAVE_LOCK:
+        cached = _WORKBOOKS.get(filename)
+        if cached is None:
+            _remove_orphaned_temp_files(filename)
+            if os.path.exists(filename):
+                workbook = load_workbook(filename)
+                headers = [cell.value for cell in workbook.active[1]]
+            else:
+                workbook = _new_workbook(headers)
+            cached = _WORKBOOKS[filename] = (workbook, list(headers))
+        workbook, headers = cached
+        sheet = workbook.active
         
-        # Create DataFrame from the new data
-        new_df = pd.DataFrame([data])
-        
-        # Check if file exists
+        for data in rows:
+            sheet.append([data.get(header, "") for header in headers])
+        _save_atomic(workbook, filename)
+
+# Saves are write-behind: rows wait here and a background thread writes each file once per batch,
+# every FLUSH_INTERVAL seconds or as soon as FLUSH_BATCH_SIZE rows are waiting for a file
+FLUSH_INTERVAL = 2.0
+FLUSH_BATCH_SIZE = 50
+_PENDING: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+_PENDING_HEADERS: Dict[str, Tuple[str, ...]] = {}
+_PENDING_LOCK = threading.Lock()
+_FLUSH_NOW = threading.Event()
+# Held by a flush from taking its batch until it is saved, so flushes keep the rows in order
+# and shutdown can wait for one in progress
+_FLUSH_LOCK = threading.Lock()
+_STOP = threading.Event()
+_writer_thread = None
+
+def _writer_loop() -> None:
+    while not _STOP.is_set():
+        _FLUSH_NOW.wait(FLUSH_INTERVAL)
+        _FLUSH_NOW.clear()
+        flush_pending_saves()
+
+# This process is the only writer, so each file is parsed once and its rows are then kept in memory;
+# saves extend the list and reads never touch the disk again. Guarded by _PENDING_LOCK.
+_ROWS: Dict[str, List[Dict[str, Any]]] = {}
+_COLUMNS: Dict[str, Tuple[str, ...]] = {}
+_FRAMES: Dict[str, pd.DataFrame] = {}
+
+def _hydrate(filename: str, headers: Tuple[str, ...]) -> List[Dict[str, Any]]:
+    """Return the in-memory rows of a file, reading the file on first use. Call with _PENDING_LOCK held."""
+    rows = _ROWS.get(filename)
+    if rows is None:
         if os.path.exists(filename):
-            # Read existing data
-            existing_df = pd.read_excel(filename)
-            # Append new data
-            updated_df = pd.concat([existing_df, new_df], ignore_index=True)
+            # Streaming read-only parse straight to dicts, without pandas' read_excel conversion layer
+            workbook = load_workbook(filename, read_only=True)
+            try:
+                values = workbook.active.iter_rows(values_only=True)
+                columns = tuple(next(values, ()))
+                rows = [dict(zip(columns, row)) for row in values if any(cell is not None for cell in row)]
+            finally:
+                workbook.close()
+            _COLUMNS[filename] = columns
         else:
-            # Create new file with headers
-            updated_df = new_df
-        
-        # Save to Excel
-        updated_df.to_excel(filename, index=False)
-        return True
-        
-    except Exception as e:
-        print(f"Error saving workshop lead: {e}")
-        return False
+            _COLUMNS[filename] = headers
+            rows = []
+        _ROWS[filename] = rows
+    return rows
+
+def _rows_frame(filename: str, headers: Tuple[str, ...]) -> pd.DataFrame:
+    """DataFrame of a file's in-memory rows, rebuilt only after a save added rows; shared, so treat it as read-only."""
+    import pandas as pd
+    
+    with _PENDING_LOCK:
+        df = _FRAMES.get(filename)
+        if df is None:
+            rows = _hydrate(filename, headers)
+            df = _FRAMES[filename] = pd.DataFrame(rows, columns=list(_COLUMNS[filename]))
+        return df
+
+# Excel's limit on characters in one cell
+MAX_CELL_LENGTH = 32767
 
-def save_feedback(data: Dict[str, Any], filename: str = "feedback.xlsx") -> bool:
+def _normalize_row(data: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Save feedback data to Excel file.
+    Make row values safe to store: text is stripped, control characters openpyxl
+    refuses are removed and values are cut to Excel's cell limit.
     
     Args:
-        data: Dictionary containing feedback information
-        filename: Name of the Excel file to save to
+        data: Dictionary containing the row values
         
     Returns:
-        bool: True if successful, False otherwise
+        dict: Normalized copy of the row
     """
-    try:
-        # Add timestamp
-        data['timestamp'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        # Create DataFrame from the new data
-        new_df = pd.DataFrame([data])
-        
-        # Check if file exists
-        if os.path.exists(filename):
-            # Read existing data
-            existing_df = pd.read_excel(filename)
-            # Append new data
-            updated_df = pd.concat([existing_df, new_df], ignore_index=True)
-        else:
-            # Create new file with headers
-            updated_df = new_df
-        
-        # Save to Excel
-        updated_df.to_excel(filename, index=False)
-        return True
-        
-    except Exception as e:
-        print(f"Error saving feedback: {e}")
-        return False
+    row = {}
+    for key, value in data.items():
+        if value is None:
+            value = ""
+        elif isinstance(value, str):
+            value = ILLEGAL_CHARACTERS_RE.sub("", value).strip()[:MAX_CELL_LENGTH]
+        row[key] = value
+    return row
 
-def get_student_leads(filename: str = "students_leads.xlsx") -> Optional[pd.DataFrame]:
+def _queue_row(filename: str, data: Dict[str, Any], headers: Tuple[str, ...]) -> None:
+    """Record a row in memory and queue it for the background writer, starting the writer on first use."""
+    global _writer_thread
+    row = _normalize_row(data)
+    with _PENDING_LOCK:
+        _hydrate(filename, headers).append(row)
+        _FRAMES.pop(filename, None)
+        _PENDING[filename].append(row)
+        _PENDING_HEADERS[filename] = headers
+        if len(_PENDING[filename]) >= FLUSH_BATCH_SIZE:
+            _FLUSH_NOW.set()
+        if (_writer_thread is None or not _writer_thread.is_alive()) and not _STOP.is_set():
+            _writer_thread = threading.Thread(target=_writer_loop, name="eduzen-xlsx-writer", daemon=True)
+            _writer_thread.start()
+
+def flush_pending_saves() -> None:
     """
-    Retrieve all student leads from Excel file.
-    
-    Args:
-        filename: Name of the Excel file to read from
-        
-    Returns:
-        pandas.DataFrame or None: DataFrame containing all student leads
+    Write every queued row to its Excel file now, one workbook save per file.
     """
-    try:
-        if os.path.exists(filename):
-            return pd.read_excel(filename)
-        else:
-            print(f"File {filename} does not exist")
-            return None
-    except Exception as e:
-        print(f"Error reading student leads: {e}")
-        return None
+    with _FLUSH_LOCK:
+        with _PENDING_LOCK:
+            pending = dict(_PENDING)
+            _PENDING.clear()
+        for filename, rows in pending.items():
+            try:
+                _append_rows(filename, rows, _PENDING_HEADERS[filename])
+            except Exception as e:
+                print(f"Error writing {len(rows)} queued rows to {filename}: {e}")
+
+def _shutdown_writer() -> None:
+    """
+    Stop the background writer and write whatever is still queued. Waits for a batch the
+    writer is in the middle of saving, so it is neither lost nor left as a temporary file.
+    """
+    _STOP.set()
+    _FLUSH_NOW.set()
+    if _writer_thread is not None:
+        _writer_thread.join()
+    # Also waits for a flush another thread has already taken rows for
+    flush_pending_saves()
+
+# The writer is a daemon thread, so it is stopped and drained explicitly when the process exits
+atexit.register(_shutdown_writer)
 
-def get_workshop_leads(filename: str = "workshops_leads.xlsx") -> Optional[pd.DataFrame]:
+def save(kind: str, data: Dict[str, Any], filename: Optional[str] = None) -> bool:
     """
-    Retrieve all workshop leads from Excel file.
+    Save a record to its Excel file. The row is queued and written by a background thread.
     
     Args:
-        filename: Name of the Excel file to read from
+        kind: Table to save to, a key of TABLES
+        data: Dictionary containing the record
+        filename: Name of the Excel file to save to, defaults to the table's file
         
     Returns:
-        pandas.DataFrame or None: DataFrame containing all workshop leads
+        bool: True if queued, False otherwise
     """
+    spec = TABLES[kind]
     try:
-        if os.path.exists(filename):
-            return pd.read_excel(filename)
-        else:
-            print(f"File {filename} does not exist")
-            return None
+        # Add timestamp
+        data['timestamp'] = datetime.now().isoformat(sep=" ", timespec="seconds")
+        
+        _queue_row(filename or spec.filename, data, spec.columns)
+        # Nothing writes in the background any more once the process is exiting
+        if _STOP.is_set():
+            flush_pending_saves()
+        return True
+        
     except Exception as e:
-        print(f"Error reading workshop leads: {e}")
-        return None
+        print(f"Error saving {spec.title}: {e}")
+        return False
 
-def get_feedback_data(filename: str = "feedback.xlsx") -> Optional[pd.DataFrame]:
+def load(kind: str, filename: Optional[str] = None) -> Optional[pd.DataFrame]:
     """
-    Retrieve all feedback data from Excel file.
+    Retrieve all records of a table.
     
     Args:
-        filename: Name of the Excel file to read from
+        kind: Table to read, a key of TABLES
+        filename: Name of the Excel file to read from, defaults to the table's file
         
     Returns:
-        pandas.DataFrame or None: DataFrame containing all feedback
+        pandas.DataFrame or None: DataFrame containing all records
     """
+    spec = TABLES[kind]
+    filename = filename or spec.filename
     try:
-        if os.path.exists(filename):
-            return pd.read_excel(filename)
+        if filename in _ROWS or os.path.exists(filename):
+            return _rows_frame(filename, spec.columns)
         else:
             print(f"File {filename} does not exist")
             return None
     except Exception as e:
-        print(f"Error reading feedback data: {e}")
+        print(f"Error reading {spec.title}: {e}")
         return None
 
+# Per-table names kept for existing callers
+save_student_lead = functools.partial(save, "student")
+save_workshop_lead = functools.partial(save, "workshop")
+save_feedback = functools.partial(save, "feedback")
+get_student_leads = functools.partial(load, "student")
+get_workshop_leads = functools.partial(load, "workshop")
+get_feedback_data = functools.partial(load, "feedback")
+
 def initialize_excel_files():
     """
     Initialize Excel files with appropriate headers if they don't exist.
     """
-    # Student leads headers
-    student_headers = {
-        'name': [],
-        'email': [],
-        'language': [],
-        'subjects': [],
-        'grade': [],
-        'location': [],
-        'contact_info': [],
-        'timestamp': []
-    }
-    
-    # Workshop leads headers
-    workshop_headers = {
-        'organization_name': [],
-        'contact_person': [],
-        'email': [],
-        'phone': [],
-        'program_type': [],
-        'program_name': [],
-        'description': [],
-        'target_audience': [],
-        'duration': [],
-        'location': [],
-        'expected_participants': [],
-        'timestamp': []
-    }
-    
-    # Feedback headers
-    feedback_headers = {
-        'user_question': [],
-        'category': [],
-        'urgency': [],
-        'contact_info': [],
-        'timestamp': []
-    }
-    
     # Create files if they don't exist
-    if not os.path.exists("students_leads.xlsx"):
-        pd.DataFrame(student_headers).to_excel("students_leads.xlsx", index=False)
-    
-    if not os.path.exists("workshops_leads.xlsx"):
-        pd.DataFrame(workshop_headers).to_excel("workshops_leads.xlsx", index=False)
-    
-    if not os.path.exists("feedback.xlsx"):
-        pd.DataFrame(feedback_headers).to_excel("feedback.xlsx", index=False)
+    with _SAVE_LOCK:
+        for spec in TABLES.values():
+            _remove_orphaned_temp_files(spec.filename)
+            if not os.path.exists(spec.filename):
+                _save_atomic(_new_workbook(spec.columns), spec.filename)
 
 if __name__ == "__main__":
     # Initialize the Excel files